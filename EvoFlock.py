@@ -1,5 +1,7 @@
 import random
 import math
+from collections import OrderedDict
+from itertools import count
 
 class EvoFlock:
     """EvoFlock is a simulation of a predator-prey scenario where the prey are subject to an Evolutionary Algorithm.
@@ -26,7 +28,9 @@ class EvoFlock:
         self.creature_type = creature_type
 
         self.closest_prey = -1
+        self.creature_ids = count()
         self.creatures = []
+        self.population = OrderedDict()  # Creatures by id, oldest first
         self.create_creatures()
         self.best_creature = 0
         self.predator_mutation_rate = 0.2
@@ -61,23 +65,39 @@ class EvoFlock:
         """Creates the population of prey"""
         [self.creatures.append(Creature(self, 'simple')) for _ in range(self.num_creatures)]
 
-    def select_parents(self):
-        """Selects two parents based on the specified method."""
+    @property
+    def oldest_creature(self):
+        """The creature that has survived the longest."""
+        return next(iter(self.population.values()))
+
+    def ranked_creatures(self):
+        """Returns the creatures ordered by lifespan, longest first."""
+        return list(self.population.values())
+
+    def register_birth(self, creature):
+        """Gives a creature a new id and birth timestep and moves it to the back of the population."""
+        self.population.pop(creature.id, None)
+        creature.id = next(self.creature_ids)
+        creature.birth_timestep = self.timesteps
+        self.population[creature.id] = creature
+
+    def select_parents(self, caught):
+        """Selects two parents based on the specified method, excluding the caught creature."""
         parent_a, parent_b = None, None
         method = self.selection_method
         if method == 'random':
             # Random selection
             # While parent_a is the caught creature or None select a new creature
-            while (parent_a := self.creatures[random.randint(0, self.num_creatures - 1)]) is self.closest_prey or parent_a is None:
+            while (parent_a := self.creatures[random.randint(0, self.num_creatures - 1)]) is caught or parent_a is None:
                 pass
             # While parent_b is the caught creature, parent_a or None select a new creature
-            while (parent_b := self.creatures[random.randint(0, self.num_creatures - 1)]) is self.closest_prey or parent_b is parent_a or parent_b is None:
+            while (parent_b := self.creatures[random.randint(0, self.num_creatures - 1)]) is caught or parent_b is parent_a or parent_b is None:
                 pass
 
         elif method == 'rank':
             randomness_factor = self.selection_randomness
             # Rank selection with optional randomness
-            ranked_population = sorted(self.creatures, key=lambda x: x.lifespan, reverse=True)
+            ranked_population = self.ranked_creatures()
             n = len(ranked_population)
             rank_sum = n * (n + 1) / 2
             selection_probabilities = [(n - i) / rank_sum for i in range(n)]
@@ -90,9 +110,9 @@ class EvoFlock:
                     if rand < cumulative_probability:
                         return individual
 
-            while (parent_a := select_individual(randomness_factor)) is self.closest_prey:
+            while (parent_a := select_individual(randomness_factor)) is caught:
                 pass
-            while (parent_b := select_individual(randomness_factor)) is parent_a or parent_b is self.closest_prey:
+            while (parent_b := select_individual(randomness_factor)) is parent_a or parent_b is caught:
                 pass
 
         elif method == 'tournament':
@@ -102,23 +122,24 @@ class EvoFlock:
                 tournament = random.sample(self.creatures, tournament_size)
                 return max(tournament, key=lambda x: x.lifespan)
 
-            while (parent_a := select_individual()) is self.closest_prey:
+            while (parent_a := select_individual()) is caught:
                 pass
-            while (parent_b := select_individual()) is parent_a or parent_b is self.closest_prey:
+            while (parent_b := select_individual()) is parent_a or parent_b is caught:
                 pass
 
         return parent_a, parent_b
 
-    def create_new_creature(self):
+    def create_new_creature(self, caught):
         """When a creature is caught by the predator, a new creature must be made. The parents are selected,
         crossover and mutation is applied, then it is released into the world with a random position and heading."""
-        parent_a, parent_b = self.select_parents()
+        parent_a, parent_b = self.select_parents(caught)
 
-        self.closest_prey.crossover(parent_a, parent_b)
-        self.closest_prey.mutate()
+        caught.crossover(parent_a, parent_b)
+        caught.mutate()
         self.reproductions += 1
-        self.closest_prey.randomize_position()
-        self.closest_prey.randomize_heading()
+        self.register_birth(caught)
+        caught.randomize_position()
+        caught.randomize_heading()
 
     def main_loop(self):
         """Main loop of the application, updates the eyes, heading and positions of each prey before updating the
@@ -127,10 +148,9 @@ class EvoFlock:
         [c.update_heading() for c in self.creatures]
         [c.update_position() for c in self.creatures]
         [c.resolve_collisions() for c in self.creatures]
-        [c.update_lifespan() for c in self.creatures]
-        self.best_creature = max(self.creatures, key=lambda creature: creature.lifespan).lifespan
         self.predator.update_predator()
         self.timesteps += 1
+        self.best_creature = self.oldest_creature.lifespan
 
 class Agent:
     """Class defining the base attributes of an Agent in the simulation. Creature and Predator will inherit from
@@ -235,7 +255,8 @@ class Creature(Agent):
             self.genotype_length += 4  # 4 new attributes (speed, size, number of eyes, distance to predator) + eyes
             self.genotype = [random.uniform(-1, 1) for _ in range(self.genotype_length)]
         self.speed = evoflock.creature_speed
-        self.lifespan = 0
+        self.id = None
+        evoflock.register_birth(self)
 
         # for genome in range(len(self.genotype)):
         #     self.genotype[genome] = evoflock.random_float(2) - 1
@@ -272,8 +293,10 @@ class Creature(Agent):
                 if eye_index != -1:
                     self.eyes[eye_index] += 1
 
-    def update_lifespan(self):
-        self.lifespan += 1
+    @property
+    def lifespan(self):
+        """Number of timesteps since this creature was born."""
+        return self.evoflock.timesteps - self.birth_timestep
 
     def resolve_collisions(self):
         """Adjusts the position of the creature to resolve collisions with other creatures"""
@@ -345,9 +368,9 @@ class Predator(Agent):
         and mutation if the creature gets caught."""
         self.nearest_creature_distance: float = 999
         self.nearest_creature_heading: float = -1.0
-        for creature in range(self.evoflock.num_creatures):
-            dx = float(self.evoflock.creatures[creature].x_position - self.x_position)
-            dy = float(self.evoflock.creatures[creature].y_position - self.y_position)
+        for creature in self.evoflock.creatures:
+            dx = float(creature.x_position - self.x_position)
+            dy = float(creature.y_position - self.y_position)
 
             if not self.evoflock.bounded:
                 if dx < -0.5:
@@ -363,12 +386,12 @@ class Predator(Agent):
             d = math.sqrt((dx * dx) + (dy * dy))
 
             if d < self.nearest_creature_distance:
-                self.evoflock.closest_prey = self.evoflock.creatures[creature]
+                self.evoflock.closest_prey = creature
                 self.nearest_creature_distance = d
                 self.nearest_creature_heading = self.wrap_360(math.degrees(math.atan2(-dy, dx)))
 
         if self.nearest_creature_distance < self.evoflock.creature_diameter:
-            self.evoflock.create_new_creature()
+            self.evoflock.create_new_creature(self.evoflock.closest_prey)
             self.creatures_caught += 1
 
             if self.mode == 'advanced':
@@ -0,0 +1,99 @@
+"""
+EvoFlock Headless
+
+Runs the simulation without a window. Viewers can attach to the snapshot stream to watch the run remotely.
+Sweeps run every combination of configuration and seed, stopping each run early once it has converged or failed.
+
+
+"""
+import random
+from multiprocessing import Pool
+
+import EvoFlock
+import metrics
+import stream
+
+
+def run_headless(evoflock, timesteps=None, server=None, flock_metrics=None, stop_criteria=(), recorder=None):
+    """Runs the main loop for the given number of timesteps, or forever if timesteps is None. If a SnapshotServer is
+    given the state is published to it after every tick. If a TrajectoryRecorder is given it records every tick. If
+    FlockMetrics are given they are updated every tick and the run ends as soon as any of the stop criteria is met.
+    Returns the criterion that stopped the run, or None."""
+    if flock_metrics is not None:
+        flock_metrics.attach(evoflock)
+    try:
+        while timesteps is None or evoflock.timesteps < timesteps:
+            evoflock.main_loop()
+            if server is not None:
+                server.publish(evoflock)
+            if recorder is not None:
+                recorder.record(evoflock)
+            if flock_metrics is not None and flock_metrics.update(evoflock):
+                for criterion in stop_criteria:
+                    if criterion(flock_metrics):
+                        return criterion
+        return None
+    finally:
+        if recorder is not None:
+            recorder.flush()
+
+
+def run_seed(config, seed, timesteps, interval=100, window=1000, stop_criteria=()):
+    """Runs a single configuration with a fixed seed and returns a summary of the run."""
+    random.seed(seed)
+    evoflock = EvoFlock.EvoFlock(**config)
+    flock_metrics = metrics.FlockMetrics(interval=interval, window=window)
+    stopped_by = run_headless(evoflock, timesteps, flock_metrics=flock_metrics, stop_criteria=stop_criteria)
+    return {
+        'config': config,
+        'seed': seed,
+        'timesteps': evoflock.timesteps,
+        'reproductions': evoflock.reproductions,
+        'stopped_by': stopped_by.name if stopped_by is not None else None,
+        'metrics': flock_metrics.history,
+        'genotypes': [(c.id, c.lifespan, c.genotype) for c in evoflock.ranked_creatures()],
+        'mutation_log': getattr(evoflock.predator, 'mutation_log', []),
+    }
+
+
+def _run_job(job):
+    return run_seed(*job)
+
+
+def run_sweep(configs, seeds, timesteps, interval=100, window=1000, stop_criteria=(), processes=None, store=None):
+    """Runs every configuration with every seed across a process pool. Configurations are dicts of EvoFlock
+    arguments. If a ResultsStore is given each run is queued for writing as soon as it finishes."""
+    jobs = [(config, seed, timesteps, interval, window, stop_criteria) for config in configs for seed in seeds]
+    results = []
+    with Pool(processes) as pool:
+        for result in pool.imap(_run_job, jobs):
+            if store is not None:
+                store.add_result(result)
+            results.append(result)
+    return results
+
+
+def main():
+    bounded = True
+    num_creatures = 50
+    selection_method = 'rank' # random, rank, tournament
+    randomness_factor = 0.1
+    tournament_size = 3
+    predator_type = 'advanced'
+    creature_type = 'simple'
+    evoflock = EvoFlock.EvoFlock(bounded=bounded, num_creatures=num_creatures, selection_method=selection_method,
+                                 randomness_factor=randomness_factor, tournament_size=tournament_size,
+                                 predator_type=predator_type, creature_type=creature_type)
+    server = stream.SnapshotServer(host='127.0.0.1', port=8765)
+    server.start()
+    print(f'Streaming snapshots on {server.host}:{server.port}')
+    try:
+        run_headless(evoflock, server=server)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
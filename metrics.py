@@ -0,0 +1,126 @@
+"""
+EvoFlock Metrics
+
+Measures whether flocking has emerged during a run. Catches are counted every tick; the more expensive metrics are
+only computed every `interval` timesteps.
+"""
+import math
+from collections import deque
+
+METRICS = ('polarization', 'nearest_neighbour_distance', 'catch_rate', 'genotype_diversity')
+
+
+def polarization(evoflock) -> float:
+    """Order parameter of the flock: 1 when every creature shares a heading, near 0 when headings are random."""
+    sum_x = sum(evoflock.cos_degrees(c.heading) for c in evoflock.creatures)
+    sum_y = sum(evoflock.sin_degrees(c.heading) for c in evoflock.creatures)
+    return math.hypot(sum_x, sum_y) / len(evoflock.creatures)
+
+
+def nearest_neighbour_distance(evoflock) -> float:
+    """Mean distance from each creature to its closest neighbour, wrapping around the world if it is unbounded."""
+    xs = [c.x_position for c in evoflock.creatures]
+    ys = [c.y_position for c in evoflock.creatures]
+    n = len(xs)
+    nearest = [math.inf] * n
+    for i in range(n):
+        for j in range(i + 1, n):
+            dx = abs(xs[i] - xs[j])
+            dy = abs(ys[i] - ys[j])
+            if not evoflock.bounded:
+                dx = min(dx, 1 - dx)
+                dy = min(dy, 1 - dy)
+            d = math.sqrt(dx * dx + dy * dy)
+            if d < nearest[i]:
+                nearest[i] = d
+            if d < nearest[j]:
+                nearest[j] = d
+    return sum(nearest) / n
+
+
+def genotype_diversity(evoflock) -> float:
+    """Mean standard deviation of each gene across the population. Falls to 0 as the population converges."""
+    n = len(evoflock.creatures)
+    total = 0.0
+    genes = list(zip(*(c.genotype for c in evoflock.creatures)))
+    for gene in genes:
+        mean = sum(gene) / n
+        total += math.sqrt(sum((g - mean) ** 2 for g in gene) / n)
+    return total / len(genes)
+
+
+class FlockMetrics:
+    """Tracks the flock metrics over a run. Call update() once per tick; `history` holds one entry per interval."""
+    def __init__(self, interval=100, window=1000):
+        self.interval = interval
+        self.window = window
+        self.history = []
+
+        self._catch_times = deque()
+        self._reproductions = None  # Baseline taken when attached, so earlier catches are not counted
+        self._start = None
+
+    @property
+    def latest(self):
+        """The most recent set of metrics, or None before the first interval."""
+        return self.history[-1] if self.history else None
+
+    def attach(self, evoflock):
+        """Starts measuring from the current state of the run. Call this before the next tick so that its catches
+        are counted; otherwise the first update() attaches and measures from the tick after it. Does nothing if already
+        attached."""
+        if self._start is not None:
+            return
+        self._reproductions = evoflock.reproductions
+        self._start = evoflock.timesteps
+
+    def catch_rate(self, timesteps: int) -> float:
+        """Catches per timestep over the sliding window, or over the ticks since attaching if fewer."""
+        return len(self._catch_times) / max(1, min(self.window, timesteps - self._start))
+
+    def update(self, evoflock) -> bool:
+        """Records this tick's catches. Returns True when a new set of metrics has been computed."""
+        timesteps = evoflock.timesteps
+        if self._start is None:
+            self.attach(evoflock)
+        caught = evoflock.reproductions - self._reproductions
+        if caught:
+            self._catch_times.extend([timesteps] * caught)
+            self._reproductions = evoflock.reproductions
+        while self._catch_times and self._catch_times[0] <= timesteps - self.window:
+            self._catch_times.popleft()
+
+        if timesteps % self.interval:
+            return False
+        self.history.append({
+            'timestep': timesteps,
+            'polarization': polarization(evoflock),
+            'nearest_neighbour_distance': nearest_neighbour_distance(evoflock),
+            'catch_rate': self.catch_rate(timesteps),
+            'genotype_diversity': genotype_diversity(evoflock),
+        })
+        return True
+
+
+class StoppingCriterion:
+    """Stops a run once `metric` has been at or above (or at or below) `threshold` for `patience` consecutive
+    intervals, e.g. StoppingCriterion('polarization', 0.9, patience=10) for a run that has converged to a flock."""
+    def __init__(self, metric: str, threshold: float, above=True, patience=1, name=None):
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric!r}, expected one of {METRICS}')
+        self.metric = metric
+        self.threshold = threshold
+        self.above = above
+        self.patience = patience
+        self.name = name or f"{metric} {'>=' if above else '<='} {threshold}"
+
+    def __call__(self, metrics: FlockMetrics) -> bool:
+        recent = metrics.history[-self.patience:]
+        if len(recent) < self.patience:
+            return False
+        if self.above:
+            return all(entry[self.metric] >= self.threshold for entry in recent)
+        return all(entry[self.metric] <= self.threshold for entry in recent)
+
+    def __repr__(self):
+        return f'StoppingCriterion({self.name})'
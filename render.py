@@ -0,0 +1,166 @@
+"""
+EvoFlock Render
+
+Renders runs to video offline, without Qt or a display. Agents are rasterized straight into RGB byte buffers across a
+process pool and the frames are written out as an image sequence or piped into an encoder such as ffmpeg.
+
+Frames can come from a live simulation or from a recording. Recordings are files of stream keyframes, so every
+frame can be decoded on its own.
+"""
+import os
+import subprocess
+from array import array
+from collections import deque
+from functools import partial
+from multiprocessing import Pool
+
+import stream
+
+BACKGROUND = bytes((255, 255, 255))
+CREATURE_COLOUR = bytes((0, 255, 0))
+PREDATOR_COLOUR = bytes((0, 0, 0))
+
+
+class TrajectoryRecorder:
+    """Writes a keyframe to file every `record_every` timesteps. Pass it to run_headless to record a run, and use it
+    as a context manager so the file is closed even if the run is interrupted."""
+    def __init__(self, path, record_every=1):
+        self.record_every = record_every
+        self.file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, evoflock):
+        if evoflock.timesteps % self.record_every == 0:
+            self.file.write(stream.encode_keyframe(*stream.capture_snapshot(evoflock)))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read_recording(path):
+    """Yields (timestep, values) for each frame of a recording. A recording cut off part way through a frame, as
+    happens when a run is interrupted, ends at the last complete frame."""
+    with open(path, 'rb') as file:
+        while len(header := file.read(stream.HEADER.size)) == stream.HEADER.size:
+            magic, frame_type, timestep, count = stream.HEADER.unpack(header)
+            if magic != stream.MAGIC or frame_type != stream.KEYFRAME:
+                raise ValueError(f'{path} is not an EvoFlock recording')
+            payload = file.read(12 * count)
+            if len(payload) < 12 * count:
+                return
+            yield timestep, array('f', payload)
+
+
+def rasterize(snapshot, width=600, height=600, agent_size=0.015):
+    """Draws one snapshot as an RGB buffer of width * height pixels. Returns (timestep, frame)."""
+    timestep, values = snapshot
+    count = len(values) // 3
+    frame = bytearray(BACKGROUND * (width * height))
+    side = max(1, round(agent_size * width))
+    for i in range(count):
+        colour = PREDATOR_COLOUR if i == count - 1 else CREATURE_COLOUR
+        left = min(max(int(values[i] * (width - side)), 0), width - side)
+        top = min(max(int(values[count + i] * (height - side)), 0), height - side)
+        row = colour * side
+        for y in range(top, top + side):
+            start = 3 * (y * width + left)
+            frame[start:start + 3 * side] = row
+    return timestep, frame
+
+
+class ImageSequence:
+    """Writes each frame as a binary PPM image named by `pattern`, formatted with the timestep."""
+    def __init__(self, pattern='frame_{:08d}.ppm'):
+        self.pattern = pattern
+
+    def write(self, timestep, frame, width, height):
+        with open(self.pattern.format(timestep), 'wb') as file:
+            file.write(f'P6 {width} {height} 255\n'.encode())
+            file.write(frame)
+
+    def close(self):
+        pass
+
+
+class EncoderPipe:
+    """Streams raw RGB frames into the stdin of an encoder process."""
+    def __init__(self, command):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, timestep, frame, width, height):
+        try:
+            self.process.stdin.write(frame)
+        except BrokenPipeError as error:
+            self._check(self.process.wait(), error)
+            raise
+
+    def close(self):
+        """Waits for the encoder to finish. Raises CalledProcessError if it failed."""
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass  # The encoder exited early; its return code says why
+        self._check(self.process.wait())
+
+    def _check(self, returncode, cause=None):
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, self.process.args) from cause
+
+
+def ffmpeg_command(path, width=600, height=600, fps=30):
+    """Builds an ffmpeg command that encodes raw RGB frames from stdin to path."""
+    return ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+            '-r', str(fps), '-i', '-', '-pix_fmt', 'yuv420p', path]
+
+
+def render_frames(snapshots, sink, width=600, height=600, agent_size=0.015, processes=None, max_pending=None):
+    """Rasterizes snapshots across a process pool and writes them to the sink in order. At most `max_pending` frames
+    (twice the number of processes by default) are in flight, so a slow sink holds back the snapshots rather than
+    letting frames pile up in memory. Returns the number of frames written."""
+    processes = processes or os.cpu_count()
+    max_pending = max_pending or 2 * processes
+    draw = partial(rasterize, width=width, height=height, agent_size=agent_size)
+    pending = deque()
+    frames = 0
+    try:
+        with Pool(processes) as pool:
+            for snapshot in snapshots:
+                pending.append(pool.apply_async(draw, (snapshot,)))
+                if len(pending) >= max_pending:
+                    sink.write(*pending.popleft().get(), width, height)
+                    frames += 1
+            while pending:
+                sink.write(*pending.popleft().get(), width, height)
+                frames += 1
+    except BaseException:
+        try:
+            sink.close()
+        except Exception:
+            pass  # Keep the original error rather than the one it caused on close
+        raise
+    sink.close()
+    return frames
+
+
+def render_recording(path, sink, **kwargs):
+    """Renders every frame of a recording."""
+    return render_frames(read_recording(path), sink, **kwargs)
+
+
+def render_live(evoflock, timesteps, sink, render_every=1, **kwargs):
+    """Runs the simulation up to the given number of timesteps while the pool renders every `render_every`th
+    tick."""
+    def snapshots():
+        while evoflock.timesteps < timesteps:
+            evoflock.main_loop()
+            if evoflock.timesteps % render_every == 0:
+                yield stream.capture_snapshot(evoflock)
+    return render_frames(snapshots(), sink, **kwargs)
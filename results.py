@@ -0,0 +1,295 @@
+"""
+EvoFlock Results
+
+Stores the results of runs and sweeps in a local SQLite database: configuration, seed, metrics per interval, the
+final genotypes and the predator's mutation log.
+
+Writes are queued and inserted in batches by a background thread, so recording a run never waits on the disk. Call
+flush() before querying results that were only just added.
+"""
+import inspect
+import json
+import operator
+import queue
+import sqlite3
+import threading
+import uuid
+
+import EvoFlock
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    selection_method TEXT,
+    seed INTEGER,
+    bounded INTEGER,
+    num_creatures INTEGER,
+    randomness_factor REAL,
+    tournament_size INTEGER,
+    predator_type TEXT,
+    creature_type TEXT,
+    timesteps INTEGER,
+    reproductions INTEGER,
+    stopped_by TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT,
+    timestep INTEGER,
+    polarization REAL,
+    nearest_neighbour_distance REAL,
+    catch_rate REAL,
+    genotype_diversity REAL
+);
+CREATE TABLE IF NOT EXISTS genotypes (
+    run_id TEXT,
+    creature_id INTEGER,
+    lifespan INTEGER,
+    genotype TEXT
+);
+CREATE TABLE IF NOT EXISTS mutations (
+    run_id TEXT,
+    timestamp INTEGER,
+    creatures_caught INTEGER,
+    original TEXT,
+    mutated TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_selection ON runs (selection_method, seed);
+CREATE INDEX IF NOT EXISTS runs_config ON runs (predator_type, creature_type, bounded, num_creatures);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id, timestep);
+CREATE INDEX IF NOT EXISTS metrics_timestep ON metrics (timestep);
+CREATE INDEX IF NOT EXISTS genotypes_run ON genotypes (run_id);
+CREATE INDEX IF NOT EXISTS mutations_run ON mutations (run_id, timestamp);
+"""
+
+CONFIG_COLUMNS = ('selection_method', 'bounded', 'num_creatures', 'randomness_factor', 'tournament_size',
+                  'predator_type', 'creature_type')
+DEFAULT_CONFIG = {name: parameter.default
+                  for name, parameter in inspect.signature(EvoFlock.EvoFlock).parameters.items()}
+FILTER_COLUMNS = CONFIG_COLUMNS + ('seed', 'stopped_by')
+
+INSERTS = {
+    'runs': f"INSERT INTO runs VALUES ({', '.join('?' * 12)})",
+    'metrics': 'INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)',
+    'genotypes': 'INSERT INTO genotypes VALUES (?, ?, ?, ?)',
+    'mutations': 'INSERT INTO mutations VALUES (?, ?, ?, ?, ?)',
+}
+
+
+def _check_metric(metric: str):
+    if metric not in metrics.METRICS:
+        raise ValueError(f'Unknown metric {metric!r}, expected one of {metrics.METRICS}')
+
+
+def _integer(value, name):
+    if value is None or isinstance(value, bool):
+        return value if value is None else int(value)
+    try:
+        return operator.index(value)
+    except TypeError:
+        raise TypeError(f'{name} must be an integer, got {value!r}') from None
+
+
+def _real(value, name):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise TypeError(f'{name} must be a number, got {value!r}') from None
+
+
+def _text(value, name):
+    if value is not None and not isinstance(value, str):
+        raise TypeError(f'{name} must be a string, got {value!r}')
+    return value
+
+
+def _genotype(genotype, name):
+    return json.dumps([_real(gene, name) for gene in genotype])
+
+
+def _where(filters):
+    """Builds a WHERE clause on the runs table from keyword filters."""
+    for column in filters:
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f'Cannot filter on {column!r}, expected one of {FILTER_COLUMNS}')
+    if not filters:
+        return '', []
+    return ' WHERE ' + ' AND '.join(f'r.{column} = ?' for column in filters), list(filters.values())
+
+
+class ResultsStore:
+    """SQLite results database in WAL mode with a background writer thread."""
+    def __init__(self, path='results.db', batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+
+        self._queue = queue.Queue()
+        self._reader = None
+        self._error = None
+        self._closed = False
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self._writer = threading.Thread(target=self._write, name='evoflock-results', daemon=True)
+        self._writer.start()
+
+    def add_run(self, config, seed=None, timesteps=0, reproductions=0, stopped_by=None, metrics_history=(),
+                genotypes=(), mutation_log=()) -> str:
+        """Queues a run for writing and returns its run id. Genotypes are (creature id, lifespan, genotype)."""
+        self._check_open()
+        run_id = uuid.uuid4().hex
+        config = {**DEFAULT_CONFIG, **config}
+        rows = {
+            'runs': [(run_id, _text(config['selection_method'], 'selection_method'), _integer(seed, 'seed'),
+                      int(bool(config['bounded'])), _integer(config['num_creatures'], 'num_creatures'),
+                      _real(config['randomness_factor'], 'randomness_factor'),
+                      _integer(config['tournament_size'], 'tournament_size'),
+                      _text(config['predator_type'], 'predator_type'), _text(config['creature_type'], 'creature_type'),
+                      _integer(timesteps, 'timesteps'), _integer(reproductions, 'reproductions'),
+                      _text(stopped_by, 'stopped_by'))],
+            'metrics': [(run_id, _integer(entry['timestep'], 'timestep'),
+                         *(_real(entry[metric], metric) for metric in metrics.METRICS))
+                        for entry in metrics_history],
+            'genotypes': [(run_id, _integer(creature_id, 'creature_id'), _integer(lifespan, 'lifespan'),
+                           _genotype(genotype, 'genotype'))
+                          for creature_id, lifespan, genotype in genotypes],
+            'mutations': [(run_id, _integer(entry['timestamp'], 'timestamp'),
+                           _integer(entry['creatures_caught'], 'creatures_caught'),
+                           _genotype(entry['original'], 'original'), _genotype(entry['mutated'], 'mutated'))
+                          for entry in mutation_log],
+        }
+        self._queue.put(rows)
+        return run_id
+
+    def record_run(self, evoflock, seed=None, flock_metrics=None, stopped_by=None) -> str:
+        """Queues the current state of a run."""
+        config = {'selection_method': evoflock.selection_method, 'bounded': evoflock.bounded,
+                  'num_creatures': evoflock.num_creatures, 'randomness_factor': evoflock.selection_randomness,
+                  'tournament_size': evoflock.selection_tournament_size, 'predator_type': evoflock.predator_type,
+                  'creature_type': evoflock.creature_type}
+        return self.add_run(config, seed, evoflock.timesteps, evoflock.reproductions,
+                            stopped_by.name if stopped_by is not None else None,
+                            flock_metrics.history if flock_metrics is not None else (),
+                            [(c.id, c.lifespan, c.genotype) for c in evoflock.ranked_creatures()],
+                            getattr(evoflock.predator, 'mutation_log', ()))
+
+    def add_result(self, result) -> str:
+        """Queues a run summary as returned by headless.run_seed."""
+        return self.add_run(result['config'], result['seed'], result['timesteps'], result['reproductions'],
+                            result['stopped_by'], result['metrics'], result['genotypes'], result['mutation_log'])
+
+    def flush(self):
+        """Waits until everything queued so far has been written. Raises the first error the writer hit since the
+        last flush; runs that could not be written are lost, the others are kept."""
+        self._check_open()
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Writes anything still queued and closes the database. It is safe to close a store more than once."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        self._raise_error()
+
+    def _check_open(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError('Cannot write to a closed ResultsStore')
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _write(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                runs = [rows for rows in batch if rows is not None]
+                running = len(runs) == len(batch)
+                try:
+                    self._insert(connection, runs)
+                except sqlite3.Error:
+                    # Retry run by run so one bad run does not lose the rest of the batch
+                    for rows in runs:
+                        try:
+                            self._insert(connection, [rows])
+                        except sqlite3.Error as error:
+                            self._error = self._error or error
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        connection.close()
+
+    @staticmethod
+    def _insert(connection, runs):
+        """Inserts the rows of several runs in one transaction."""
+        with connection:
+            for table, sql in INSERTS.items():
+                table_rows = [row for rows in runs for row in rows[table]]
+                if table_rows:
+                    connection.executemany(sql, table_rows)
+
+    def query(self, sql, parameters=()):
+        """Runs a read-only query on the database."""
+        if self._reader is None:
+            self._reader = sqlite3.connect(self.path, check_same_thread=False)
+            self._reader.row_factory = sqlite3.Row
+        return self._reader.execute(sql, parameters).fetchall()
+
+    def runs(self, **filters):
+        """Returns the runs matching the given configuration, e.g. runs(selection_method='rank')."""
+        where, parameters = _where(filters)
+        return self.query(f'SELECT * FROM runs r{where} ORDER BY r.selection_method, r.seed', parameters)
+
+    def final_metrics(self, metric='polarization', **filters):
+        """Returns (run_id, selection_method, seed, value) for the last recorded value of a metric in each run."""
+        _check_metric(metric)
+        where, parameters = _where(filters)
+        return self.query(
+            f'SELECT r.run_id, r.selection_method, r.seed, m.{metric} AS value FROM runs r '
+            f'JOIN metrics m ON m.run_id = r.run_id '
+            f'AND m.timestep = (SELECT MAX(timestep) FROM metrics WHERE run_id = r.run_id){where} '
+            f'ORDER BY r.selection_method, r.seed', parameters)
+
+    def compare_selection_methods(self, metric='polarization', **filters):
+        """Summarises the final value of a metric for each selection method across seeds. Returns a dict of
+        selection method to (mean, minimum, maximum, number of runs)."""
+        _check_metric(metric)
+        where, parameters = _where(filters)
+        rows = self.query(
+            f'SELECT r.selection_method, AVG(m.{metric}), MIN(m.{metric}), MAX(m.{metric}), COUNT(*) FROM runs r '
+            f'JOIN metrics m ON m.run_id = r.run_id '
+            f'AND m.timestep = (SELECT MAX(timestep) FROM metrics WHERE run_id = r.run_id){where} '
+            f'GROUP BY r.selection_method', parameters)
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def metric_series(self, metric='polarization', **filters):
+        """Returns the mean of a metric at each timestep for each selection method, as a dict of selection method to
+        [(timestep, mean)]."""
+        _check_metric(metric)
+        where, parameters = _where(filters)
+        series = {}
+        for method, timestep, value in self.query(
+                f'SELECT r.selection_method, m.timestep, AVG(m.{metric}) FROM runs r '
+                f'JOIN metrics m ON m.run_id = r.run_id{where} '
+                f'GROUP BY r.selection_method, m.timestep ORDER BY r.selection_method, m.timestep', parameters):
+            series.setdefault(method, []).append((timestep, value))
+        return series
@@ -0,0 +1,207 @@
+"""
+EvoFlock Stream
+
+Publishes live snapshots of a running simulation over TCP so that any number of viewers can watch a headless run
+without slowing it down.
+
+Each frame starts with a fixed header (magic, frame type, timestep, agent count) followed by the agents' positions
+and headings, predator last. Keyframes carry the full state as packed float32 values. Delta frames carry int16
+differences against the state the viewer already holds, so a viewer that falls behind simply receives fewer frames.
+"""
+import asyncio
+import socket
+import struct
+import threading
+from array import array
+
+MAGIC = b'EVFL'
+HEADER = struct.Struct('<4sBIH')  # magic, frame type, timestep, agent count
+KEYFRAME = 0
+DELTA = 1
+
+POSITION_STEP = 1 / 65536  # int16 position deltas cover +/- 0.5 of the world
+HEADING_STEP = 0.01  # int16 heading deltas cover +/- 327 degrees
+
+
+def capture_snapshot(evoflock):
+    """Captures the positions and headings of every creature and the predator as (timestep, float32 array). The
+    array holds all x positions, then all y positions, then all headings."""
+    agents = evoflock.creatures + [evoflock.predator]
+    values = array('f', [agent.x_position for agent in agents])
+    values.extend([agent.y_position for agent in agents])
+    values.extend([agent.heading for agent in agents])
+    return evoflock.timesteps, values
+
+
+def encode_keyframe(timestep: int, values: array) -> bytes:
+    """Encodes a full snapshot."""
+    return HEADER.pack(MAGIC, KEYFRAME, timestep, len(values) // 3) + values.tobytes()
+
+
+def encode_delta(timestep: int, values: array, reference: array):
+    """Encodes a snapshot as quantized differences from reference and applies the same differences to reference, so
+    that it keeps matching what the viewer reconstructs. Returns None if a difference is too large for a delta."""
+    count = len(values) // 3
+    deltas = array('h', bytes(2 * len(values)))
+    for i in range(len(values)):
+        difference = values[i] - reference[i]
+        if i < 2 * count:
+            step = POSITION_STEP
+        else:
+            step = HEADING_STEP
+            difference = (difference + 180) % 360 - 180
+        quantized = round(difference / step)
+        if not -32768 <= quantized <= 32767:
+            return None
+        deltas[i] = quantized
+    apply_delta(reference, deltas)
+    return HEADER.pack(MAGIC, DELTA, timestep, count) + deltas.tobytes()
+
+
+def apply_delta(reference: array, deltas: array):
+    """Applies quantized differences to a float32 state in place. Used by both the server and the viewers."""
+    count = len(reference) // 3
+    for i in range(len(reference)):
+        if i < 2 * count:
+            reference[i] = reference[i] + deltas[i] * POSITION_STEP
+        else:
+            reference[i] = (reference[i] + deltas[i] * HEADING_STEP) % 360
+
+
+class _Viewer:
+    """Per-connection state: the snapshot the viewer holds and whether a newer one is waiting."""
+    def __init__(self):
+        self.reference = None
+        self.frames_since_keyframe = 0
+        self.pending = asyncio.Event()
+
+    def encode(self, timestep: int, values: array, keyframe_interval: int) -> bytes:
+        """Encodes the next frame for this viewer, falling back to a keyframe when needed."""
+        if (self.reference is not None and len(self.reference) == len(values)
+                and self.frames_since_keyframe < keyframe_interval):
+            frame = encode_delta(timestep, values, self.reference)
+            if frame is not None:
+                self.frames_since_keyframe += 1
+                return frame
+        self.reference = array('f', values)
+        self.frames_since_keyframe = 0
+        return encode_keyframe(timestep, values)
+
+
+class SnapshotServer:
+    """Runs an asyncio TCP server on a background thread. The simulation calls publish() after each tick; viewers
+    that cannot keep up only ever receive the most recent snapshot."""
+    def __init__(self, host='127.0.0.1', port=8765, publish_every=1, keyframe_interval=100):
+        self.host = host
+        self.port = port
+        self.publish_every = publish_every
+        self.keyframe_interval = keyframe_interval
+
+        self._viewers = set()
+        self._latest = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Starts serving on a daemon thread and waits until the port is bound."""
+        self._thread = threading.Thread(target=self._run, name='evoflock-stream', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._server is None:
+            raise OSError(f'Could not listen on {self.host}:{self.port}')
+
+    def stop(self):
+        """Closes the server and all viewer connections."""
+        if self._loop is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def publish(self, evoflock):
+        """Hands the current state to the viewers. Cheap when nobody is watching and never waits on the network."""
+        if not self._viewers or evoflock.timesteps % self.publish_every:
+            return
+        self._loop.call_soon_threadsafe(self._set_latest, capture_snapshot(evoflock))
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._serve_viewer, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError:
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+    def _set_latest(self, snapshot):
+        self._latest = snapshot
+        for viewer in self._viewers:
+            viewer.pending.set()
+
+    async def _serve_viewer(self, reader, writer):
+        viewer = _Viewer()
+        self._viewers.add(viewer)
+        if self._latest is not None:
+            viewer.pending.set()
+        try:
+            while True:
+                await viewer.pending.wait()
+                viewer.pending.clear()
+                timestep, values = self._latest
+                writer.write(viewer.encode(timestep, values, self.keyframe_interval))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._viewers.discard(viewer)
+            writer.close()
+
+
+class SnapshotClient:
+    """Blocking viewer for a SnapshotServer. Iterating yields (timestep, xs, ys, headings) with the predator last."""
+    def __init__(self, host='127.0.0.1', port=8765):
+        self.socket = socket.create_connection((host, port))
+        self.stream = self.socket.makefile('rb')
+        self.state = None
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+    def read_frame(self):
+        """Reads and decodes the next frame. Returns None once the server has gone away."""
+        header = self.stream.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, frame_type, timestep, count = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError('Not an EvoFlock stream')
+
+        size = (12 if frame_type == KEYFRAME else 6) * count
+        payload = self.stream.read(size)
+        if len(payload) < size:
+            return None
+
+        if frame_type == KEYFRAME:
+            self.state = array('f', payload)
+        elif self.state is None:
+            raise ValueError('Delta frame received before a keyframe')
+        else:
+            apply_delta(self.state, array('h', payload))
+        return (timestep, self.state[:count], self.state[count:2 * count], self.state[2 * count:])
+
+    def __iter__(self):
+        while (frame := self.read_frame()) is not None:
+            yield frame
@@ -88,7 +88,7 @@ class UserInterface(QtWidgets.QWidget):
         """
         # populate the grid with blue squares representing creatures
         for creature in self.evo_flock.creatures:
-            if self.evo_flock.creatures.index(creature) == self.evo_flock.closest_prey:
+            if creature is self.evo_flock.closest_prey:
                 self.draw_creatures(True, creature)
             else:
                 self.draw_creatures(True, creature)  # Draw Creatures